@@ -1,8 +1,15 @@
 from langgraph.prebuilt import create_react_agent
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
+from .media import WHISPER_MODEL_PATH
+from .vector_store import index_in_background
+from .resource_scheduler import cpu_budget
 import whisper
 import ssl
+import os
+import queue
+import threading
+from contextlib import contextmanager
 
 ssl._create_default_https_context = ssl._create_unverified_context
 
@@ -11,12 +18,45 @@ llm = ChatGoogleGenerativeAI(
     model="gemini-2.0-flash",
 )
 
+# Whisper models are not safe to share between threads, so each transcription
+# borrows its own. Transcriptions hold a CPU slot, so at most one model per
+# slot is ever loaded.
+_idle_models = queue.LifoQueue()
+_loaded_models = 0
+_models_lock = threading.Lock()
+
+@contextmanager
+def whisper_model():
+    """Borrow a Whisper model for one transcription, loading one only if none is idle."""
+    global _loaded_models
+    try:
+        model = _idle_models.get_nowait()
+    except queue.Empty:
+        with _models_lock:
+            load = _loaded_models < cpu_budget.capacity
+            if load:
+                _loaded_models += 1
+        if load:
+            try:
+                model = whisper.load_model(WHISPER_MODEL_PATH)
+            except Exception:
+                with _models_lock:
+                    _loaded_models -= 1
+                raise
+        else:
+            model = _idle_models.get()
+    try:
+        yield model
+    finally:
+        _idle_models.put(model)
+
 # @tool
 def summarize_audio(file_path: str) -> str:
     """summarize the audio file or return hello"""
-    model = whisper.load_model("models/base.en.pt")
-    result = model.transcribe(file_path)
+    with cpu_budget.slot(), whisper_model() as model:
+        result = model.transcribe(file_path)
     print(result["text"])
+    index_in_background(result["text"], os.path.basename(file_path), "audio")
     return result["text"]
 
 audio_summarizer_agent = create_react_agent(
@@ -0,0 +1,224 @@
+import argparse
+import html
+import os
+import time
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional
+
+from dotenv import load_dotenv
+from langchain_google_genai import ChatGoogleGenerativeAI
+from .media import WHISPER_MODEL_PATH, file_kind
+from .pdf_index import file_hash, get_index
+from .vector_store import index_in_background
+from .resource_scheduler import (
+    cpu_budget, memory_budget, estimate_memory_mb, llm_budget, TooLargeError,
+    discard_process_pool, get_process_pool,
+)
+
+load_dotenv()
+
+llm = ChatGoogleGenerativeAI(
+    model="gemini-2.0-flash",
+)
+
+MAX_CONTENT_CHARS = 3000
+LLM_MAX_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+
+# Loaded lazily, once per worker process
+_whisper_model = None
+
+def _extract_pdf(file_path: str, name: str) -> str:
+    # Files are already spread across the pool, so don't fan out per page too
+    return "\n".join(get_index(file_path, source=name, parallel=False)["pages"])
+
+
+def _transcribe_audio(file_path: str) -> str:
+    global _whisper_model
+    if _whisper_model is None:
+        import ssl
+        import whisper
+
+        ssl._create_default_https_context = ssl._create_unverified_context
+        _whisper_model = whisper.load_model(WHISPER_MODEL_PATH)
+    return _whisper_model.transcribe(file_path)["text"]
+
+
+def _extract(kind: str, file_path: str, name: str) -> str:
+    """Runs inside a pool worker: turn one file into plain text."""
+    if kind == "pdf":
+        return _extract_pdf(file_path, name)
+    return _transcribe_audio(file_path)
+
+
+def _print_progress(item: dict, done: int, total: int):
+    print(f"[batch {done}/{total}] {item['name']}: {item['status']}")
+
+
+def _email_body(instruction: str, items: List[dict]) -> str:
+    sections = [f"<p><b>Request:</b> {html.escape(instruction)}</p>"]
+    for item in items:
+        text = item.get("summary") or item.get("error") or ""
+        sections.append(
+            f"<h3>{html.escape(item['name'])}</h3>"
+            f"<p>{html.escape(text).replace(chr(10), '<br>')}</p>"
+        )
+    return "\n".join(sections)
+
+
+def process_batch(
+    file_paths: List[str],
+    instruction: str,
+    names: Optional[List[str]] = None,
+    receiver_address: Optional[str] = None,
+    email_subject: Optional[str] = None,
+    on_progress: Optional[Callable[[dict, int, int], None]] = None,
+) -> dict:
+    """Extract, summarize and optionally email many PDFs / recordings at once.
+
+    Identical files are processed once. Text extraction runs in the shared,
+    long-lived process pool, with every file holding a CPU slot and
+    its estimated memory while it is processed. The summaries are requested
+    from the LLM as a single batch.
+    """
+    start = time.perf_counter()
+    names = names or [os.path.basename(path) for path in file_paths]
+    on_progress = on_progress or _print_progress
+    total = len(file_paths)
+    done = 0
+
+    items = []
+    unique = {}  # digest -> {"kind", "path", "items"}
+    for path, name in zip(file_paths, names):
+        item = {"name": name, "status": "queued"}
+        items.append(item)
+        kind = file_kind(path)
+        if kind is None:
+            item["status"] = "failed"
+            item["error"] = "Unsupported file type"
+            done += 1
+            on_progress(item, done, total)
+            continue
+        digest = file_hash(path)
+        item["kind"] = kind
+        item["digest"] = digest
+        entry = unique.setdefault(digest, {"kind": kind, "path": path, "items": []})
+        if entry["items"]:
+            item["duplicate_of"] = entry["items"][0]["name"]
+        entry["items"].append(item)
+
+    # --- Extraction: PDF parsing and Whisper transcription across cores ---
+    texts = {}
+    futures = {}
+    for digest, entry in unique.items():
+        memory_mb = estimate_memory_mb(entry["path"], os.path.getsize(entry["path"]))
+        try:
+            memory_budget.acquire(memory_mb)
+        except TooLargeError as e:
+            for item in entry["items"]:
+                item["status"] = "failed"
+                item["error"] = str(e)
+                done += 1
+                on_progress(item, done, total)
+            continue
+        cpu_budget.acquire()
+        args = (_extract, entry["kind"], entry["path"], entry["items"][0]["name"])
+        try:
+            pool = get_process_pool()
+            try:
+                future = pool.submit(*args)
+            except BrokenProcessPool:
+                discard_process_pool(pool)
+                pool = get_process_pool()
+                future = pool.submit(*args)
+        except Exception:
+            cpu_budget.release()
+            memory_budget.release(memory_mb)
+            raise
+        future.add_done_callback(lambda _, mb=memory_mb: (cpu_budget.release(), memory_budget.release(mb)))
+        # Remember the pool, so a broken one is discarded rather than its replacement
+        futures[future] = (digest, pool)
+
+    for future in as_completed(futures):
+        digest, pool = futures[future]
+        try:
+            texts[digest] = future.result()
+            entry = unique[digest]
+            index_in_background(texts[digest], entry["items"][0]["name"], entry["kind"])
+            status, error = "extracted", None
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                discard_process_pool(pool)
+            status, error = "failed", f"Failed to extract: {str(e)}"
+        for item in unique[digest]["items"]:
+            item["status"] = status
+            if error:
+                item["error"] = error
+                done += 1
+            on_progress(item, done, total)
+
+    # --- Summarization: one batched LLM call per unique input ---
+    digests = list(texts)
+    prompts = [
+        f"{instruction}\n\nContent of {unique[digest]['items'][0]['name']}:\n\n{texts[digest][:MAX_CONTENT_CHARS]}"
+        for digest in digests
+    ]
+    responses = llm.batch(
+        prompts, config={"max_concurrency": LLM_MAX_CONCURRENCY, "callbacks": [llm_budget]}, return_exceptions=True
+    ) if prompts else []
+    for digest, response in zip(digests, responses):
+        for item in unique[digest]["items"]:
+            if isinstance(response, Exception):
+                item["status"] = "failed"
+                item["error"] = f"Failed to summarize: {str(response)}"
+            else:
+                item["status"] = "summarized"
+                item["summary"] = response.content
+            done += 1
+            on_progress(item, done, total)
+
+    consolidated = "\n\n".join(
+        f"{item['name']}:\n{item.get('summary') or item.get('error', '')}" for item in items
+    )
+
+    email_status = None
+    if receiver_address:
+        # Last progress update before the side effect, so a run that was
+        # handed to another worker stops here instead of emailing twice
+        on_progress({"name": "email", "status": "sending"}, done, total)
+        from .email_sender import emailer_tool
+
+        email_status = emailer_tool(
+            receiver_address,
+            _email_body(instruction, items),
+            email_subject or f"Summary of {total} files",
+        )
+
+    elapsed = time.perf_counter() - start
+    return {
+        "items": items,
+        "summary": consolidated,
+        "email_status": email_status,
+        "total_files": total,
+        "unique_files": len(unique),
+        "elapsed_seconds": round(elapsed, 2),
+        "files_per_minute": round(total / (elapsed / 60), 2) if elapsed else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize many PDFs / recordings with one instruction.")
+    parser.add_argument("instruction", help="What to do with every file, e.g. 'Summarize the key points'")
+    parser.add_argument("files", nargs="+", help="PDF or audio files to process")
+    parser.add_argument("--email", help="Send the consolidated result to this address")
+    parser.add_argument("--subject", help="Subject of the consolidated email")
+    args = parser.parse_args()
+
+    result = process_batch(args.files, args.instruction, receiver_address=args.email, email_subject=args.subject)
+    print(result["summary"])
+    if result["email_status"]:
+        print(result["email_status"])
+    print(
+        f"Processed {result['total_files']} files ({result['unique_files']} unique) "
+        f"in {result['elapsed_seconds']}s - {result['files_per_minute']} files/minute"
+    )
@@ -5,6 +5,7 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
 import os
+from .resource_scheduler import network_budget
 
 load_dotenv()
 
@@ -26,7 +27,7 @@ def emailer_tool(receiver_address: str, message_body: str, email_subject: str):
         message_body = message_body.strip('"').strip("'")
         msg.attach(MIMEText(message_body, "html"))
 
-        with smtplib.SMTP(email_host, email_port) as server:
+        with network_budget.slot(), smtplib.SMTP(email_host, email_port) as server:
             server.starttls()
             server.login(email_user, email_pass)
             server.send_message(msg)
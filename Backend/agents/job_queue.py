@@ -0,0 +1,251 @@
+import os
+import threading
+import time
+import traceback
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from .state_store import get_store
+
+POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "10"))
+# A running job whose worker sent no heartbeat for this long belongs to a dead process
+STALE_JOB_SECONDS = float(os.getenv("STALE_JOB_SECONDS", "60"))
+# Finished jobs, result included, are forgotten after this many seconds
+JOB_TTL = float(os.getenv("JOB_TTL", str(24 * 3600)))
+
+jobs = get_store("jobs")
+# handler(payload, report) -> result; report(progress) stores progress on the job
+handlers: Dict[str, Callable[[dict, Callable[[dict], None]], dict]] = {}
+# cleanup(payload) runs once the job is done or failed, never for a requeued run
+cleanups: Dict[str, Callable[[dict], None]] = {}
+
+
+class JobRequeued(Exception):
+    """The job was handed back to the queue; this run should stop working on it."""
+
+
+def register_handler(kind: str, handler: Callable, cleanup: Optional[Callable[[dict], None]] = None):
+    handlers[kind] = handler
+    if cleanup:
+        cleanups[kind] = cleanup
+
+
+def submit(kind: str, payload: dict) -> str:
+    job_id = uuid.uuid4().hex
+    with jobs.lock():
+        jobs.set(f"job:{job_id}", {
+            "id": job_id, "kind": kind, "payload": payload,
+            "status": "queued", "created": time.time(),
+        })
+        jobs.set("queue", jobs.get("queue", []) + [job_id])
+    return job_id
+
+
+def queue_depth() -> dict:
+    return {"queued": len(jobs.get("queue", [])), "running": len(jobs.get("running", {}))}
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    return jobs.get(f"job:{job_id}")
+
+
+def _set_status(job_id: str, **fields) -> dict:
+    job = jobs.get(f"job:{job_id}")
+    job.update(fields, updated=time.time())
+    jobs.set(f"job:{job_id}", job)
+    return job
+
+
+def _owns(running: dict, job_id: str, token: str) -> bool:
+    info = running.get(job_id)
+    return info is not None and info["token"] == token
+
+
+def claim() -> Optional[dict]:
+    """Pop the oldest queued job and mark it as running in this process.
+
+    The returned job carries a "token" identifying this run; a run whose
+    token no longer matches was requeued and must not report a result.
+    """
+    with jobs.lock():
+        queue = jobs.get("queue", [])
+        if not queue:
+            return None
+        job_id = queue.pop(0)
+        jobs.set("queue", queue)
+        token = uuid.uuid4().hex
+        now = time.time()
+        running = jobs.get("running", {})
+        running[job_id] = {"pid": os.getpid(), "token": token, "started": now, "heartbeat": now}
+        jobs.set("running", running)
+        job = _set_status(job_id, status="running", worker=os.getpid())
+        return {**job, "token": token}
+
+
+def heartbeat(job_id: str, token: str) -> bool:
+    with jobs.lock():
+        running = jobs.get("running", {})
+        if not _owns(running, job_id, token):
+            return False
+        running[job_id]["heartbeat"] = time.time()
+        jobs.set("running", running)
+        return True
+
+
+def set_progress(job_id: str, token: str, progress: dict):
+    with jobs.lock():
+        if not _owns(jobs.get("running", {}), job_id, token):
+            raise JobRequeued(job_id)
+        _set_status(job_id, progress=progress)
+
+
+def finish(job_id: str, token: str, **fields) -> bool:
+    """Record the outcome of a run. Returns False if the run was requeued meanwhile."""
+    with jobs.lock():
+        running = jobs.get("running", {})
+        if not _owns(running, job_id, token):
+            return False
+        running.pop(job_id)
+        jobs.set("running", running)
+        _set_status(job_id, **fields)
+        # job_id -> finish time, swept by requeue_stale()
+        finished = jobs.get("finished", {})
+        finished[job_id] = time.time()
+        jobs.set("finished", finished)
+        return True
+
+
+def _requeue_locked(job_id: str):
+    running = jobs.get("running", {})
+    running.pop(job_id, None)
+    jobs.set("running", running)
+    jobs.set("queue", [job_id] + jobs.get("queue", []))
+    _set_status(job_id, status="queued", worker=None)
+
+
+def requeue(job_id: str, token: Optional[str] = None):
+    """Put a running job back at the front of the queue (only this run's, if a token is given)."""
+    with jobs.lock():
+        if token is None or _owns(jobs.get("running", {}), job_id, token):
+            _requeue_locked(job_id)
+
+
+def _expire_finished_locked(now: float):
+    finished = jobs.get("finished", {})
+    expired = [job_id for job_id, finished_at in finished.items() if now - finished_at > JOB_TTL]
+    if not expired:
+        return
+    for job_id in expired:
+        jobs.delete(f"job:{job_id}")
+        finished.pop(job_id)
+    jobs.set("finished", finished)
+
+
+def requeue_stale() -> List[str]:
+    """Requeue jobs whose worker stopped sending heartbeats, and drop expired finished jobs."""
+    with jobs.lock():
+        now = time.time()
+        stale = [
+            job_id for job_id, info in jobs.get("running", {}).items()
+            if now - info["heartbeat"] > STALE_JOB_SECONDS
+        ]
+        for job_id in stale:
+            print(f"Requeueing stale job {job_id}")
+            _requeue_locked(job_id)
+        _expire_finished_locked(now)
+    return stale
+
+
+class JobWorker:
+    """Background thread that runs queued jobs in this process.
+
+    A second thread sends heartbeats for the running job, so other workers
+    can requeue it if this process dies. To drain, call request_stop() and
+    then join(): the worker stops claiming jobs and finishes the current one,
+    or hands it back to the queue if it doesn't finish in time.
+    """
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._exited = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="job-worker", daemon=True)
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        self.current = None  # (job_id, token)
+
+    def start(self):
+        requeue_stale()
+        self._thread.start()
+        self._heartbeat_thread.start()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                # A store error (e.g. "database is locked") must not end the worker
+                try:
+                    job = claim()
+                    if job is None:
+                        self._stop.wait(POLL_INTERVAL)
+                        continue
+                    self._run_job(job)
+                except Exception:
+                    traceback.print_exc()
+                    self._stop.wait(POLL_INTERVAL)
+        finally:
+            self._exited.set()
+
+    def _run_job(self, job: dict):
+        job_id, token = job["id"], job["token"]
+        self.current = (job_id, token)
+        print(f"Running job {job_id} ({job['kind']})")
+        try:
+            try:
+                result = handlers[job["kind"]](job["payload"], lambda progress: set_progress(job_id, token, progress))
+                owned = finish(job_id, token, status="done", result=result)
+            except JobRequeued:
+                owned = False
+            except Exception as e:
+                traceback.print_exc()
+                owned = finish(job_id, token, status="failed", error=str(e))
+        finally:
+            # If recording the outcome failed, the job goes stale and is requeued
+            self.current = None
+        if not owned:
+            print(f"Job {job_id} was requeued, dropping this run")
+        elif job["kind"] in cleanups:
+            cleanups[job["kind"]](job["payload"])
+
+    def _heartbeat(self):
+        # Keeps running while draining, until the worker thread has exited
+        while not self._exited.wait(HEARTBEAT_INTERVAL):
+            try:
+                current = self.current
+                if current:
+                    heartbeat(*current)
+                else:
+                    requeue_stale()
+            except Exception:
+                traceback.print_exc()
+
+    def request_stop(self):
+        self._stop.set()
+
+    def join(self, timeout: Optional[float] = None):
+        self._thread.join(timeout)
+        current = self.current
+        if self._thread.is_alive() and current:
+            print(f"Job {current[0]} did not finish before shutdown, requeueing")
+            requeue(*current)
+
+    def stop(self, timeout: Optional[float] = None):
+        self.request_stop()
+        self.join(timeout)
+
+
+def stop_workers(workers: List[JobWorker], timeout: float):
+    """Stop every worker at once, then wait at most `timeout` seconds in total."""
+    for worker in workers:
+        worker.request_stop()
+    deadline = time.monotonic() + timeout
+    for worker in workers:
+        worker.join(max(0.0, deadline - time.monotonic()))
@@ -0,0 +1,17 @@
+import os
+from typing import Optional
+
+PDF_EXTENSIONS = {".pdf"}
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".m4a", ".ogg", ".flac", ".webm", ".mp4"}
+# Loaded by the audio summarizer and by the batch pool workers
+WHISPER_MODEL_PATH = "models/base.en.pt"
+
+
+def file_kind(file_path: str) -> Optional[str]:
+    """Return "pdf", "audio" or None based on the file extension."""
+    ext = os.path.splitext(file_path or "")[1].lower()
+    if ext in PDF_EXTENSIONS:
+        return "pdf"
+    if ext in AUDIO_EXTENSIONS:
+        return "audio"
+    return None
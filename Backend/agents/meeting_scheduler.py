@@ -7,8 +7,12 @@ from langchain_openai import ChatOpenAI
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_community.tools import tool
 from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from .state_store import get_store
+from .resource_scheduler import network_budget
+import json
 import pickle
 load_dotenv()
 
@@ -18,20 +22,64 @@ llm = ChatOpenAI(
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
-def get_calendar_service():
-    creds = None
+# Shared by all workers. token.pickle is still written next to it, so a token
+# generated locally (README step 4.5) is copied into the Docker image and
+# seeds the store of a fresh container.
+credentials_store = get_store("credentials")
+
+def _save_credentials(creds):
+    credentials_store.set("google_calendar", creds.to_json())
+    with open('token.pickle', 'wb') as token:
+        pickle.dump(creds, token)
+
+def _load_credentials():
+    info = credentials_store.get("google_calendar")
+    if info:
+        return Credentials.from_authorized_user_info(json.loads(info), SCOPES)
     if os.path.exists('token.pickle'):
         with open('token.pickle', 'rb') as token:
             creds = pickle.load(token)
-
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
+        credentials_store.set("google_calendar", creds.to_json())
+        return creds
+    return None
+
+class CalendarNotAuthorized(Exception):
+    """There is no usable Google Calendar token; run authorize() once (README step 4.5)."""
+
+def _refreshed_credentials():
+    """Return valid credentials, refreshing an expired token, or None if there is none."""
+    creds = _load_credentials()
+    if creds and creds.valid:
+        return creds
+    if not (creds and creds.expired and creds.refresh_token):
+        return None
+    # Only one worker refreshes the token, the others pick up its result
+    with credentials_store.lock("google_calendar"):
+        creds = _load_credentials()
+        if creds and not creds.valid and creds.expired and creds.refresh_token:
             creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-            creds = flow.run_local_server(port=8000)
-        with open('token.pickle', 'wb') as token:
-            pickle.dump(creds, token)
+            _save_credentials(creds)
+    return creds if creds and creds.valid else None
+
+def authorize():
+    """Sign in through the browser and store the token. Run once, outside the server."""
+    flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
+    # Any free port, the API itself listens on 8000
+    creds = flow.run_local_server(port=0)
+    with credentials_store.lock("google_calendar"):
+        _save_credentials(creds)
+    return creds
+
+def get_calendar_service(interactive: bool = False):
+    creds = _refreshed_credentials()
+    if creds is None:
+        # Waiting for a browser sign-in would block the request indefinitely
+        if not interactive:
+            raise CalendarNotAuthorized(
+                "Google Calendar is not authorized. Run "
+                "`python -c \"from agents.meeting_scheduler import authorize; authorize()\"` once."
+            )
+        creds = authorize()
 
     return build('calendar', 'v3', credentials=creds)
 
@@ -154,6 +202,8 @@ def suggest_booking(user_input: str) -> str:
                 return "Boss is not available. Please try another day."
             return (f"❌ Boss has another meeting at that time.\n"
                     f"📌 Nearest available time is {next_slot}.")
+    except CalendarNotAuthorized as e:
+        return f"❗ {str(e)}"
     except Exception:
         print("yes")
         return "❗ Invalid input. Use format like '2025-07-12T11:00:00|60' (datetime|duration)."
@@ -162,7 +212,8 @@ def suggest_booking(user_input: str) -> str:
 @tool
 def tool_suggest_booking_for_boss(time: str) -> str:
     """Suggests a meeting time or returns the nearest available slot if not free."""
-    return suggest_booking(time)
+    with network_budget.slot():
+        return suggest_booking(time)
 
 
 meeting_scheduler_agent = create_react_agent(
@@ -4,6 +4,7 @@ from langchain_core.tools import Tool
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 import json
+from .resource_scheduler import network_budget
 
 load_dotenv()
 
@@ -16,7 +17,8 @@ tavily = TavilySearch(max_results=10, search_depth="advanced")
 
 # 2. Define a custom tool using tavily.invoke
 def tavily_news_tool_func(query):
-    return tavily.invoke({"query": query}).get("results", [])
+    with network_budget.slot():
+        return tavily.invoke({"query": query}).get("results", [])
 
 # 3. Create the tool for the agent
 web_search_tool = Tool(
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import math
+import mmap
+import os
+import re
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from pypdf import PdfReader
+from .state_store import get_store
+from .resource_scheduler import cpu_budget, discard_process_pool, get_process_pool
+
+INDEX_DIR = Path(os.getenv("PDF_INDEX_DIR", "pdf_index"))
+# File name -> hash of the last PDF uploaded under that name
+sources = get_store("pdf_sources")
+
+# Documents with at least this many pages are split across worker processes
+PARALLEL_PAGE_THRESHOLD = int(os.getenv("PDF_PARALLEL_PAGES", "40"))
+MIN_PAGES_PER_WORKER = 10
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+@contextmanager
+def _open_mmap(file_path: str):
+    """Memory-map a file read-only so pages are paged in on demand."""
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+def file_hash(file_path: str) -> str:
+    """SHA-256 of the file contents, read through mmap."""
+    with _open_mmap(file_path) as mm:
+        return hashlib.sha256(mm).hexdigest()
+
+
+def page_count(file_path: str) -> int:
+    with _open_mmap(file_path) as mm:
+        return len(PdfReader(mm).pages)
+
+
+def iter_pages(file_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+    """Lazily yield (page_number, text) for pages [start, stop), 1-based numbers."""
+    with _open_mmap(file_path) as mm:
+        reader = PdfReader(mm)
+        stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+        for i in range(start, stop):
+            yield i + 1, reader.pages[i].extract_text() or ""
+
+
+def _extract_range(file_path: str, start: int, stop: int) -> List[str]:
+    """Runs inside a pool worker: extract the text of one page range."""
+    return [text for _, text in iter_pages(file_path, start, stop)]
+
+
+def extract_pages(file_path: str, parallel: bool = True) -> List[str]:
+    """Return the text of every page, using worker processes for large documents."""
+    total = page_count(file_path)
+    workers = min(os.cpu_count() or 1, math.ceil(total / MIN_PAGES_PER_WORKER))
+    if not parallel or total < PARALLEL_PAGE_THRESHOLD or workers < 2:
+        with cpu_budget.slot():
+            return _extract_range(file_path, 0, total)
+
+    # Take as many CPU slots as worker processes, within the budget
+    workers = min(workers, cpu_budget.capacity)
+    if workers < 2:
+        with cpu_budget.slot():
+            return _extract_range(file_path, 0, total)
+    step = math.ceil(total / workers)
+    ranges = [(start, min(start + step, total)) for start in range(0, total, step)]
+    with cpu_budget.slot(len(ranges)):
+        pool = get_process_pool()
+        starts, stops = zip(*ranges)
+        try:
+            chunks = list(pool.map(_extract_range, [file_path] * len(ranges), starts, stops))
+        except BrokenProcessPool:
+            discard_process_pool(pool)
+            raise
+        return [text for chunk in chunks for text in chunk]
+
+
+# --- Persisted page-level index, keyed by file hash ---
+
+def _index_file(digest: str) -> Path:
+    return INDEX_DIR / f"{digest}.json"
+
+
+def _write_json(path: Path, data):
+    # Write to a temp file first so readers never see a half-written index
+    tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def load_index(digest: str) -> Optional[dict]:
+    path = _index_file(digest)
+    if not path.exists():
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def get_index(file_path: str, source: Optional[str] = None, parallel: bool = True) -> dict:
+    """Return the page index for a PDF, parsing it only if it was never seen before."""
+    digest = file_hash(file_path)
+    index = load_index(digest)
+    if index is None:
+        pages = extract_pages(file_path, parallel=parallel)
+        index = {"hash": digest, "source": source or os.path.basename(file_path), "pages": pages}
+        INDEX_DIR.mkdir(parents=True, exist_ok=True)
+        _write_json(_index_file(digest), index)
+
+    name = source or os.path.basename(file_path)
+    if sources.get(name) != digest:
+        sources.set(name, digest)
+    return index
+
+
+def find_index(document: str) -> Optional[dict]:
+    """Look up a processed PDF by path, file name or hash."""
+    if os.path.isfile(document):
+        return load_index(file_hash(document))
+    digest = sources.get(os.path.basename(document))
+    if digest is None and DIGEST_PATTERN.match(document):
+        digest = document
+    # Anything else, e.g. "../state/...", must never become a path
+    return load_index(digest) if digest else None
+
+
+def read_text(file_path: str, max_chars: Optional[int] = None, source: Optional[str] = None) -> str:
+    """Text of a PDF (optionally truncated), served from the index when possible."""
+    text = "\n".join(get_index(file_path, source=source)["pages"])
+    return text if max_chars is None else text[:max_chars]
+
+
+def search_pages(index: dict, question: str, max_chars: int = 3000) -> List[Tuple[int, str]]:
+    """Pick the pages most relevant to a question, in document order.
+
+    Explicit references like "page 3" or "section 4" are honoured first,
+    then pages are ranked by how many of the question's words they contain.
+    """
+    pages = index["pages"]
+    question = question.lower()
+
+    page_refs = [int(n) for n in re.findall(r"\bpage\s+(\d+)", question)]
+    picked = [n for n in page_refs if 1 <= n <= len(pages)]
+
+    if not picked:
+        sections = re.findall(r"\b(?:section|chapter|part)\s+(\d+(?:\.\d+)*)", question)
+        terms = set(re.findall(r"[a-z0-9]{3,}", question))
+        scores = []
+        for number, text in enumerate(pages, start=1):
+            lowered = text.lower()
+            score = sum(lowered.count(term) for term in terms)
+            for section in sections:
+                # Headings usually start a line: "4 Results", "4. Results", "Section 4"
+                pattern = rf"(?m)^\s*(?:section\s+|chapter\s+|part\s+)?{re.escape(section)}\b\.?"
+                if re.search(pattern, lowered):
+                    score += 100
+            if score:
+                scores.append((score, number))
+        picked = [number for _, number in sorted(scores, reverse=True)]
+
+    result, used = [], 0
+    for number in picked:
+        text = pages[number - 1]
+        if used and used + len(text) > max_chars:
+            break
+        result.append((number, text[: max_chars - used]))
+        used += len(result[-1][1])
+    return sorted(result)
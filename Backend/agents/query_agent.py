@@ -0,0 +1,48 @@
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langgraph.graph import MessagesState
+from .vector_store import search
+
+load_dotenv()
+
+llm = ChatGoogleGenerativeAI(
+    model="gemini-2.0-flash",
+)
+
+TOP_K = 4
+
+
+def _last_user_question(messages) -> str:
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return message.content
+    return messages[-1].content if messages else ""
+
+
+def answer_from_documents(question: str, k: int = TOP_K) -> str:
+    """Answer a question from the top-k chunks of previously processed PDFs / transcripts."""
+    try:
+        hits = search(question, k=k)
+        if not hits:
+            return "No previously processed documents or recordings match this question."
+        context = "\n\n".join(f"[{source}]\n{text}" for source, text in hits)
+        response = llm.invoke(
+            "Answer the question using only the excerpts below from previously processed documents "
+            "and audio transcripts. Mention which source each fact comes from. "
+            "If the excerpts don't contain the answer, say so.\n\n"
+            f"{context}\n\nQuestion: {question}"
+        )
+        return response.content
+    except Exception as e:
+        return f"Failed to answer from documents: {str(e)}"
+
+
+def query_agent(state: MessagesState):
+    """Graph node: retrieval + one LLM call, no tool-calling round trip."""
+    answer = answer_from_documents(_last_user_question(state["messages"]))
+    return {"messages": [AIMessage(content=answer, name="query_agent")]}
+
+
+if __name__ == "__main__":
+    print(answer_from_documents("What were the main decisions?"))
@@ -1,31 +1,29 @@
 import json
 from pathlib import Path
+from .state_store import get_store
 
+# Ratings used to live in this file; it is only read to seed the shared store
 RATING_FILE = Path("ratings.json")
 
-def store_rating(rating: int):
-    """Store the new rating into ratings.json."""
-    if not RATING_FILE.exists():
-        with open(RATING_FILE, "w") as f:
-            json.dump([], f)
+ratings_store = get_store("ratings")
 
+def _legacy_ratings() -> list:
+    if not RATING_FILE.exists():
+        return []
     with open(RATING_FILE, "r") as f:
-        ratings = json.load(f)
+        return json.load(f)
 
-    ratings.append(rating)
-
-    with open(RATING_FILE, "w") as f:
-        json.dump(ratings, f)
+def store_rating(rating: int):
+    """Append the new rating to the shared ratings store."""
+    ratings_store.update("all", lambda ratings: ratings + [rating], default=_legacy_ratings())
 
 def get_average_rating() -> float:
     """Return average rating."""
-    if not RATING_FILE.exists():
-        return 0.0
-
-    with open(RATING_FILE, "r") as f:
-        ratings = json.load(f)
+    ratings = ratings_store.get("all")
+    if ratings is None:
+        ratings = _legacy_ratings()
 
     if not ratings:
         return 0.0
 
-    return round(sum(ratings) / len(ratings), 2)
\ No newline at end of file
+    return round(sum(ratings) / len(ratings), 2)
@@ -0,0 +1,271 @@
+import asyncio
+import contextvars
+import functools
+import heapq
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from .media import file_kind
+
+# Lower number = served first
+HIGH, NORMAL, LOW = 0, 1, 2
+
+# Budgets are per worker process, so split the machine between WEB_CONCURRENCY workers
+_PROCESSES = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+
+def _default_memory_mb() -> int:
+    try:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        total = 4096
+    return int(total * 0.7)
+
+
+CPU_CONCURRENCY = int(os.getenv("CPU_CONCURRENCY", max(1, (os.cpu_count() or 2) // 2 // _PROCESSES)))
+NETWORK_CONCURRENCY = int(os.getenv("NETWORK_CONCURRENCY", "16"))
+MEMORY_BUDGET_MB = int(os.getenv("MEMORY_BUDGET_MB", _default_memory_mb() // _PROCESSES))
+ADMISSION_TIMEOUT = float(os.getenv("ADMISSION_TIMEOUT", "120"))
+HEAVY_WORKERS = int(os.getenv("HEAVY_WORKERS", "32"))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+
+_priority = contextvars.ContextVar("request_priority", default=NORMAL)
+
+
+class AdmissionError(Exception):
+    """The request could not get the resources it needs in time."""
+
+
+class TooLargeError(AdmissionError):
+    """The request needs more than the whole budget and can never be admitted."""
+
+
+@contextmanager
+def priority(level: int):
+    """Set the priority used by every budget acquired inside the with-block."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class Budget:
+    """Counting semaphore that admits waiters by priority, then arrival order.
+
+    `amount` lets one caller take several units, e.g. megabytes of memory or
+    several cores for a parallel PDF parse.
+    """
+
+    def __init__(self, name: str, capacity: int, unit: str = "slots"):
+        self.name = name
+        self.capacity = capacity
+        self.unit = unit
+        self.in_use = 0
+        self._cond = threading.Condition()
+        self._waiters = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self.acquired = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self._waits = deque(maxlen=1000)
+        self._max_wait = 0.0
+
+    def check(self, amount: int = 1):
+        if amount > self.capacity:
+            self.rejected += 1
+            raise TooLargeError(
+                f"{self.name} needs {amount} {self.unit} but the budget is {self.capacity} {self.unit}"
+            )
+
+    def acquire(self, amount: int = 1, timeout: Optional[float] = None, level: Optional[int] = None) -> float:
+        """Block until `amount` units are free and this caller is first in line. Returns the wait time."""
+        self.check(amount)
+        entry = (_priority.get() if level is None else level, next(self._seq))
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            while self._waiters[0] != entry or self.in_use + amount > self.capacity:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    self.timeouts += 1
+                    self._cond.notify_all()
+                    raise AdmissionError(f"Timed out after {timeout:.0f}s waiting for {self.name}")
+                self._cond.wait(remaining)
+            heapq.heappop(self._waiters)
+            self.in_use += amount
+            waited = time.monotonic() - start
+            self.acquired += 1
+            self._waits.append(waited)
+            self._max_wait = max(self._max_wait, waited)
+            # The next waiter may fit in what is left
+            self._cond.notify_all()
+        return waited
+
+    def release(self, amount: int = 1):
+        with self._cond:
+            self.in_use -= amount
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, amount: int = 1, timeout: Optional[float] = None):
+        self.acquire(amount, timeout)
+        try:
+            yield
+        finally:
+            self.release(amount)
+
+    def stats(self) -> dict:
+        with self._cond:
+            waits = sorted(self._waits)
+            return {
+                "capacity": self.capacity,
+                "in_use": self.in_use,
+                "unit": self.unit,
+                "queue_depth": len(self._waiters),
+                "acquired": self.acquired,
+                "timeouts": self.timeouts,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+                "p95_wait_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0.0,
+                "max_wait_ms": round(self._max_wait * 1000, 1),
+            }
+
+
+# CPU-heavy tools: Whisper transcription, PDF parsing
+cpu_budget = Budget("cpu", CPU_CONCURRENCY)
+# Network-bound tools: LLM, Tavily, SMTP, Google Calendar
+network_budget = Budget("network", NETWORK_CONCURRENCY)
+# Estimated working memory of requests with large uploads
+memory_budget = Budget("memory", MEMORY_BUDGET_MB, unit="MB")
+
+budgets = [cpu_budget, network_budget, memory_budget]
+
+
+def limit_torch_threads():
+    """One torch thread per CPU slot: torch defaults to one thread per core, so
+    every concurrent model call would otherwise try to use the whole machine."""
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+
+
+def estimate_memory_mb(filename: str, size_bytes: Optional[int]) -> int:
+    """Rough peak memory needed to process an upload of this type and size."""
+    size_mb = (size_bytes or 0) / (1024 * 1024)
+    kind = file_kind(filename)
+    if kind == "pdf":
+        return int(50 + 4 * size_mb)
+    if kind == "audio":
+        # Whisper decodes the whole file to 16 kHz float32 audio on top of the model
+        return int(300 + 8 * size_mb)
+    return int(10 + 2 * size_mb)
+
+
+class BudgetCallbackHandler(BaseCallbackHandler):
+    """Holds a network slot for the duration of every chat model call."""
+
+    run_inline = True
+    raise_error = True
+
+    def __init__(self, budget: Budget):
+        self.budget = budget
+        self._runs = set()
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self.budget.acquire()
+        with self._lock:
+            self._runs.add(run_id)
+
+    def _release(self, run_id):
+        with self._lock:
+            if run_id not in self._runs:
+                return
+            self._runs.discard(run_id)
+        self.budget.release()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._release(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._release(run_id)
+
+
+llm_budget = BudgetCallbackHandler(network_budget)
+
+# Expensive endpoints wait for budgets here instead of in the shared
+# threadpool, so cheap requests like /review always find a free thread
+_heavy_executor = ThreadPoolExecutor(max_workers=HEAVY_WORKERS, thread_name_prefix="heavy")
+# Batches can wait on budgets for a long time, so they get their own threads
+# and can never use up the ones /supervisor needs
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
+
+
+async def _run_in(executor: ThreadPoolExecutor, fn, *args, **kwargs):
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(executor, call)
+
+
+async def run_heavy(fn, *args, **kwargs):
+    return await _run_in(_heavy_executor, fn, *args, **kwargs)
+
+
+async def run_batch_task(fn, *args, **kwargs):
+    return await _run_in(_batch_executor, fn, *args, **kwargs)
+
+
+# One long-lived process pool per server process for CPU-bound work (batch
+# extraction, parsing large PDFs). Work only runs there while holding CPU
+# slots, so more processes than the CPU budget would sit idle.
+PROCESS_POOL_SIZE = int(os.getenv("PROCESS_POOL_SIZE", cpu_budget.capacity))
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=PROCESS_POOL_SIZE,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=limit_torch_threads,
+            )
+        return _process_pool
+
+
+def discard_process_pool(pool: ProcessPoolExecutor):
+    """Forget a pool whose worker died (e.g. OOM-killed) so the next caller starts a fresh one."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is pool:
+            _process_pool = None
+    pool.shutdown(wait=False)
+
+
+def shutdown_process_pool():
+    """Stop the pool on server shutdown. Jobs still running by then were already requeued."""
+    global _process_pool
+    with _process_pool_lock:
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def stats() -> dict:
+    return {"pid": os.getpid(), "budgets": {budget.name: budget.stats() for budget in budgets}}
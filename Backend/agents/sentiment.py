@@ -2,6 +2,7 @@ import os
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.prebuilt import create_react_agent
+from .resource_scheduler import llm_budget, priority, HIGH
 
 load_dotenv()
 llm = ChatGoogleGenerativeAI(
@@ -32,4 +33,6 @@ sentiment_agent = create_react_agent(
 )
 
 def get_response_from_review_agent(message_history):
-    return sentiment_agent.invoke({"messages": message_history})
\ No newline at end of file
+    # Reviews are cheap, let their LLM calls go ahead of queued /supervisor and batch work
+    with priority(HIGH):
+        return sentiment_agent.invoke({"messages": message_history}, config={"callbacks": [llm_budget]})
\ No newline at end of file
@@ -0,0 +1,185 @@
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# "sqlite" (default) or "file". Both are safe to share between processes on one host.
+STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite")
+STATE_DIR = Path(os.getenv("STATE_DIR", "state"))
+
+
+def _lock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        return
+    # msvcrt.locking gives up after ~10s, keep trying like flock would
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+        return
+    f.seek(0)
+    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class StateStore(ABC):
+    """Namespaced JSON key/value store shared by every worker process."""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        STATE_DIR.mkdir(parents=True, exist_ok=True)
+
+    @abstractmethod
+    def get(self, key: str, default: Any = None) -> Any:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    def update(self, key: str, fn: Callable[[Any], Any], default: Any = None) -> Any:
+        """Atomically replace the value with fn(current) and return the new value."""
+        with self.lock():
+            value = fn(self.get(key, default))
+            self.set(key, value)
+            return value
+
+    @contextmanager
+    def lock(self, name: str = ""):
+        """Exclusive lock across threads and processes, held for the with-block."""
+        lock_dir = STATE_DIR / "locks"
+        lock_dir.mkdir(parents=True, exist_ok=True)
+        lock_name = quote(f"{self.namespace}.{name}" if name else self.namespace, safe="")
+        with open(lock_dir / f"{lock_name}.lock", "a+b") as f:
+            _lock_file(f)
+            try:
+                yield
+            finally:
+                _unlock_file(f)
+
+
+class SQLiteStore(StateStore):
+    def __init__(self, namespace: str):
+        super().__init__(namespace)
+        self.db_path = STATE_DIR / "state.db"
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None):
+        row = self._connect().execute(
+            "SELECT value FROM kv WHERE namespace = ? AND key = ?", (self.namespace, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key, value):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO kv (namespace, key, value) VALUES (?, ?, ?)",
+            (self.namespace, key, json.dumps(value)),
+        )
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def update(self, key, fn, default=None):
+        conn = self._connect()
+        # Same lock as the base class, so update() and lock()-guarded get/set exclude each other;
+        # BEGIN IMMEDIATE also makes the read-modify-write a single transaction
+        with self.lock():
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT value FROM kv WHERE namespace = ? AND key = ?", (self.namespace, key)
+                ).fetchone()
+                value = fn(json.loads(row[0]) if row else default)
+                conn.execute(
+                    "INSERT OR REPLACE INTO kv (namespace, key, value) VALUES (?, ?, ?)",
+                    (self.namespace, key, json.dumps(value)),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return value
+
+
+class FileStore(StateStore):
+    def __init__(self, namespace: str):
+        super().__init__(namespace)
+        self.dir = STATE_DIR / namespace
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.dir / f"{quote(key, safe='')}.json"
+
+    def get(self, key, default=None):
+        try:
+            with open(self._path(key), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return default
+
+    def set(self, key, value):
+        path = self._path(key)
+        # Write to a temp file first so readers never see a half-written value
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(value, f)
+        os.replace(tmp, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+_BACKENDS = {"sqlite": SQLiteStore, "file": FileStore}
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(namespace: str) -> StateStore:
+    """Return the configured store for a namespace (one instance per process)."""
+    with _stores_lock:
+        if namespace not in _stores:
+            if STATE_BACKEND not in _BACKENDS:
+                raise ValueError(f"Unknown STATE_BACKEND {STATE_BACKEND!r}, use one of {list(_BACKENDS)}")
+            _stores[namespace] = _BACKENDS[STATE_BACKEND](namespace)
+        return _stores[namespace]
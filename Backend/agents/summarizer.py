@@ -1,8 +1,10 @@
 from langchain_core.tools import tool
 from langgraph.prebuilt import create_react_agent
-from langchain_community.document_loaders import PyPDFLoader
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
+from .pdf_index import read_text, find_index, search_pages
+from .vector_store import index_in_background
+import os
 
 load_dotenv()
 
@@ -12,22 +14,42 @@ llm = ChatGoogleGenerativeAI(
 
 @tool
 def summarize_pdf(file_path: str) -> str:
-    """Use PyPDFLoader to load and summarize a PDF."""
+    """Extract the text of a PDF (cached in the page index) and summarize it."""
     try:
-        loader = PyPDFLoader(file_path)
-        pages = loader.load()
-        content = "\n".join([page.page_content for page in pages])
+        content = read_text(file_path)
+        index_in_background(content, os.path.basename(file_path), "pdf")
         response = llm.invoke(f"Summarize the following PDF:\n\n{content[:3000]}")
         return response.content
     except Exception as e:
         return f"Failed to summarize PDF: {str(e)}"
 
+@tool
+def ask_pdf(document: str, question: str) -> str:
+    """Answer a follow-up question about a PDF that was already processed, using its page index.
+    `document` is the file name (or path) of the PDF."""
+    try:
+        index = find_index(document)
+        if index is None:
+            return f"No processed PDF found for {document}. Please upload it again."
+        pages = search_pages(index, question)
+        if not pages:
+            return f"Nothing in {index['source']} matches the question."
+        context = "\n\n".join(f"[Page {number}]\n{text}" for number, text in pages)
+        response = llm.invoke(
+            f"Answer the question using only these pages of {index['source']}:\n\n{context}\n\nQuestion: {question}"
+        )
+        return response.content
+    except Exception as e:
+        return f"Failed to answer from PDF: {str(e)}"
+
 pdf_summarizer_agent = create_react_agent(
     model=llm,
-    tools=[summarize_pdf],
+    tools=[summarize_pdf, ask_pdf],
     prompt=(
         "You are a PDF summarizer agent. Use the summarize_pdf tool to process the file path provided. "
-        "Return only the summary."
+        "If the user asks about a page or section of a PDF that was already processed, use the ask_pdf tool "
+        "with the PDF's file name instead of summarizing it again. "
+        "Return only the summary or the answer."
     ),
     name="pdf_summarizer_agent",
 )
@@ -9,6 +9,7 @@ from .audio_summarizer import audio_summarizer_agent
 from .summarizer import pdf_summarizer_agent
 from .news_agent import news_search_agent
 from .meeting_scheduler import meeting_scheduler_agent
+from .query_agent import query_agent
 from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
 
@@ -18,11 +19,11 @@ llm = ChatOpenAI(
     model="gpt-4o",)
 
 PROMPT="""
-You are a supervisor managing five specialized agents:\n
+You are a supervisor managing six specialized agents:\n
 
 \n
 
-- PDF Summarizer: Accepts a PDF document uploaded by the user and returns a clear, concise summary of its contents. Used when no summary exists yet for the uploaded PDF.\n
+- PDF Summarizer: Accepts a PDF document uploaded by the user and returns a clear, concise summary of its contents. Used when no summary exists yet for the uploaded PDF. It can also answer a question about a specific page or section (e.g. "what does section 4 of report.pdf say") of a PDF that was processed before, when the user names the file, without a new upload.\n
 
 \n
 
@@ -38,6 +39,10 @@ You are a supervisor managing five specialized agents:\n
 
 \n
 
+- Document Q&A: Answers questions about PDFs and audio recordings that were already summarized earlier, by retrieving the most relevant passages from the local document index. Used for every other follow-up question when the user does not upload the file again.\n
+
+\n
+
 - Meet Scheduler: Interprets the user’s request to schedule a meeting, extracts and formats the desired date and time, checks the boss’s availability via the calendar, and either schedules the meeting or replies with the next available slot if the requested time is unavailable.\n
 
 \n
@@ -56,6 +61,10 @@ Your job is to analyze the user's request and orchestrate the correct sequence o
 
 1. If the user uploads a PDF file and no summary exists yet, call the **PDF Summarizer**.\n
 
+1a. If the user asks a follow-up question and uploads no new file:\n
+   - If the question names a previously processed PDF by file name **and** refers to a page or section of it (e.g. "page 3 of report.pdf"), call the **PDF Summarizer**.\n
+   - Otherwise (no file name, no page or section, or an audio recording), call the **Document Q&A** agent.\n
+
 2. If the user uploads an audio file and no summary exists yet, call the **Audio Summarizer**.\n
 
 3. If the user requests news content and it is not yet available, call the **News Fetcher**.\n
@@ -119,11 +128,12 @@ assign_to_audio_agent = create_handoff_tool("audio_summarizer_agent")
 assign_to_email_agent = create_handoff_tool("email_agent")
 assign_to_news_agent = create_handoff_tool("news_agent")
 assign_to_meeting_scheduler_agent = create_handoff_tool("meeting_scheduler_agent")
+assign_to_query_agent = create_handoff_tool("query_agent")
 
 # --- Supervisor Agent ---
 supervisor_agent = create_react_agent(
     model=llm,
-    tools=[assign_to_pdf_agent, assign_to_audio_agent, assign_to_email_agent, assign_to_news_agent, assign_to_meeting_scheduler_agent],
+    tools=[assign_to_pdf_agent, assign_to_audio_agent, assign_to_email_agent, assign_to_news_agent, assign_to_meeting_scheduler_agent, assign_to_query_agent],
     prompt=(
         PROMPT
     ),
@@ -133,18 +143,20 @@ supervisor_agent = create_react_agent(
 # --- LangGraph Wiring ---
 supervisor_graph = (
     StateGraph(MessagesState)
-    .add_node("supervisor", supervisor_agent, destinations=("pdf_summarizer_agent", "audio_summarizer_agent", "email_agent","news_agent", "meeting_scheduler_agent",END))
+    .add_node("supervisor", supervisor_agent, destinations=("pdf_summarizer_agent", "audio_summarizer_agent", "email_agent","news_agent", "meeting_scheduler_agent", "query_agent", END))
     .add_node("pdf_summarizer_agent", pdf_summarizer_agent, input_updates=lambda state: {**state,"summary": state["messages"][-1].content})
     .add_node("audio_summarizer_agent", audio_summarizer_agent, input_updates=lambda state:{**state, "summary": state["messages"][-1].content})
     .add_node("news_agent", news_search_agent, input_updates=lambda state:{**state, "news": sta["messages"][-1].content})
     .add_node("meeting_scheduler_agent", meeting_scheduler_agent, input_updates=lambda state:{**state, "meeting_status": state["messages"][-1].content})
     .add_node("email_agent", email_agent)
+    .add_node("query_agent", query_agent)
     .add_edge(START, "supervisor")
     .add_edge("pdf_summarizer_agent", "supervisor")
     .add_edge("audio_summarizer_agent", "supervisor")
     .add_edge("email_agent", "supervisor")
     .add_edge("news_agent", "supervisor")
     .add_edge("meeting_scheduler_agent", "supervisor")
+    .add_edge("query_agent", "supervisor")
     .compile()
 )
 
@@ -0,0 +1,132 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_community.vectorstores import FAISS
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from .state_store import get_store
+from .resource_scheduler import LOW, cpu_budget, limit_torch_threads, priority
+
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "vector_index")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 150
+
+_embeddings = None
+_store = None
+_store_generation = None
+_lock = threading.Lock()
+# Other worker processes write the same on-disk index. Every save bumps
+# "generation" under the disk lock, so a process knows when to reload.
+_meta = get_store("vector_index")
+_disk_lock = _meta.lock
+# A single worker keeps index writes ordered and off the request path
+_indexer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vector-indexer")
+
+splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+
+def get_embeddings():
+    global _embeddings
+    if _embeddings is None:
+        limit_torch_threads()
+        _embeddings = HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL,
+            model_kwargs={"device": "cpu"},
+            encode_kwargs={"normalize_embeddings": True},
+        )
+    return _embeddings
+
+
+def _load_store():
+    """Return the in-memory index, reloading it if another process saved a newer one.
+
+    Call with _disk_lock held.
+    """
+    global _store, _store_generation
+    generation = _meta.get("generation", 0)
+    if _store is not None and generation == _store_generation:
+        return _store
+    if not os.path.exists(os.path.join(VECTOR_INDEX_DIR, "index.faiss")):
+        return _store
+    _store = FAISS.load_local(VECTOR_INDEX_DIR, get_embeddings(), allow_dangerous_deserialization=True)
+    _store_generation = generation
+    return _store
+
+
+def _save_store(store):
+    """Write the index and publish a new generation. Call with _disk_lock held."""
+    global _store, _store_generation
+    store.save_local(VECTOR_INDEX_DIR)
+    _store = store
+    # Plain get/set: update() would wait for the lock this caller already holds
+    _store_generation = _meta.get("generation", 0) + 1
+    _meta.set("generation", _store_generation)
+
+
+def _is_indexed(store, doc_id: str) -> bool:
+    return store is not None and not isinstance(store.docstore.search(f"{doc_id}:0"), str)
+
+
+def index_text(text: str, source: str, kind: str) -> int:
+    """Chunk, embed and store a document. Returns the number of chunks added."""
+    text = text.strip()
+    if not text:
+        return 0
+    doc_id = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    with _lock, _disk_lock():
+        if _is_indexed(_load_store(), doc_id):
+            return 0
+
+    # Embedding is the slow part; do it without the lock so searches aren't blocked,
+    # and behind interactive requests for the CPU
+    chunks = splitter.split_text(text)
+    with priority(LOW), cpu_budget.slot():
+        vectors = get_embeddings().embed_documents(chunks)
+    text_embeddings = list(zip(chunks, vectors))
+    ids = [f"{doc_id}:{i}" for i in range(len(chunks))]
+    metadatas = [{"source": source, "kind": kind, "doc_id": doc_id, "chunk": i} for i in range(len(chunks))]
+
+    with _lock, _disk_lock():
+        store = _load_store()
+        # Another process may have indexed the same text meanwhile
+        if _is_indexed(store, doc_id):
+            return 0
+        if store is None:
+            store = FAISS.from_embeddings(text_embeddings, get_embeddings(), metadatas=metadatas, ids=ids)
+        else:
+            store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        _save_store(store)
+    print(f"Indexed {len(chunks)} chunks of {source}")
+    return len(chunks)
+
+
+def _index_safely(text: str, source: str, kind: str):
+    try:
+        index_text(text, source, kind)
+    except Exception as e:
+        print(f"Failed to index {source}: {str(e)}")
+
+
+def index_in_background(text: str, source: str, kind: str):
+    """Queue a document for indexing without delaying the caller."""
+    _indexer.submit(_index_safely, text, source, kind)
+
+
+def flush():
+    """Wait for queued indexing work, used on shutdown."""
+    _indexer.shutdown(wait=True)
+
+
+def search(question: str, k: int = 4) -> List[Tuple[str, str]]:
+    """Return the top-k (source, chunk) pairs for a question."""
+    with _lock:
+        with _disk_lock():
+            store = _load_store()
+        if store is None:
+            return []
+        docs = store.similarity_search(question, k=k)
+    return [(doc.metadata.get("source", "unknown"), doc.page_content) for doc in docs]
@@ -1,16 +1,28 @@
-from fastapi import FastAPI, UploadFile, File, Form
+from fastapi import FastAPI, UploadFile, File, Form, Request
 from agents.supervisor_agent import supervisor_graph
 from dotenv import load_dotenv 
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager, nullcontext
+from typing import List, Optional
 import uuid
 from agents.sentiment import get_response_from_review_agent
 from agents.rating_store import store_rating, get_average_rating
-from langchain_core.messages import HumanMessage, AIMessage
+from agents.batch_processor import process_batch
+from agents.state_store import get_store
+from agents import job_queue, vector_store, resource_scheduler
+from agents.resource_scheduler import (
+    AdmissionError, TooLargeError, ADMISSION_TIMEOUT, LOW, NORMAL,
+    estimate_memory_mb, llm_budget, memory_budget, priority, run_batch_task, run_heavy,
+)
+from langchain_core.messages import HumanMessage, AIMessage, messages_from_dict, messages_to_dict
 from pydantic import BaseModel
 
-session_histories = {}
-user_session = {"id": str(uuid.uuid4())}
+# Kept in the shared state store so every worker process sees the same session
+sessions = get_store("sessions")
+user_session = {"id": sessions.update("current_id", lambda sid: sid or str(uuid.uuid4()))}
 
 # Request schema (no session_id input required now)
 class ReviewRequest(BaseModel):
@@ -20,8 +32,56 @@ load_dotenv()
 
 import shutil
 import os
+import time
+
+# Review history kept per session: the latest messages only, forgotten after a day of inactivity
+REVIEW_HISTORY_LIMIT = int(os.getenv("REVIEW_HISTORY_LIMIT", "20"))
+REVIEW_SESSION_TTL = float(os.getenv("REVIEW_SESSION_TTL", str(24 * 3600)))
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "60"))
+
+def run_batch_job(payload: dict, report) -> dict:
+    progress = {"done": 0, "total": len(payload["file_paths"]), "items": {}}
+
+    def on_progress(item: dict, done: int, total: int):
+        print(f"[batch {done}/{total}] {item['name']}: {item['status']}")
+        progress["done"] = done
+        progress["items"][item["name"]] = item["status"]
+        # Raises JobRequeued if another worker took the job over
+        report(progress)
+
+    with priority(LOW):
+        return process_batch(
+            payload["file_paths"],
+            payload["instruction"],
+            names=payload["names"],
+            receiver_address=payload.get("email"),
+            email_subject=payload.get("subject"),
+            on_progress=on_progress,
+        )
+
+def remove_batch_files(payload: dict):
+    # Only called once the job is finished, never for a run that was requeued
+    for file_path in payload["file_paths"]:
+        if os.path.exists(file_path):
+            os.remove(file_path)
 
-app = FastAPI()
+job_queue.register_handler("batch", run_batch_job, cleanup=remove_batch_files)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    workers = [job_queue.JobWorker() for _ in range(JOB_WORKERS)]
+    for worker in workers:
+        worker.start()
+    yield
+    # Drain: stop taking jobs, let in-flight ones finish, flush pending index writes
+    print("Shutting down, waiting for in-flight jobs")
+    await run_in_threadpool(job_queue.stop_workers, workers, SHUTDOWN_TIMEOUT)
+    await run_in_threadpool(vector_store.flush)
+    resource_scheduler.shutdown_process_pool()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -30,19 +90,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-UPLOAD_DIR = "uploads"
+# Point this at a shared volume when running several workers / containers
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+@app.exception_handler(AdmissionError)
+async def admission_error_handler(request: Request, exc: AdmissionError):
+    if isinstance(exc, TooLargeError):
+        return JSONResponse(status_code=413, content={"detail": str(exc)})
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "30"})
+
+def invoke_supervisor(user_content: str, memory_mb: int):
+    # Wait for enough memory before the file is parsed / transcribed
+    admission = memory_budget.slot(memory_mb, timeout=ADMISSION_TIMEOUT) if memory_mb else nullcontext()
+    with priority(NORMAL), admission:
+        input_messages = [{"role": "user", "content": user_content}]
+        return supervisor_graph.invoke({"messages": input_messages}, config={"callbacks": [llm_budget]})
+
 @app.post("/supervisor")
 async def run_supervisor(
     content: str = Form(...),                 
     file: Optional[UploadFile] = File(None),  # Make file optional
 ):
     file_path = None
+    memory_mb = 0
     # FastAPI sends "" (empty string) if file field is left empty in docs UI
     if file and file.filename:
         print(f"Received file: {file.filename}")
-        file_path = os.path.join(UPLOAD_DIR, file.filename)
+        memory_mb = estimate_memory_mb(file.filename, file.size)
+        # Reject with 413 before saving and processing it (Starlette has already spooled the upload)
+        memory_budget.check(memory_mb)
+        # One directory per request so concurrent uploads with the same name don't clash
+        request_dir = os.path.join(UPLOAD_DIR, uuid.uuid4().hex)
+        os.makedirs(request_dir)
+        file_path = os.path.join(request_dir, file.filename)
         with open(file_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
 
@@ -52,25 +133,113 @@ async def run_supervisor(
         user_content += f" The file to process is at {file_path}."
     
     print(user_content)
-    input_messages = [{"role": "user", "content": user_content}]
-    final_state = supervisor_graph.invoke({"messages": input_messages})
-
-    # Optionally remove the file after processing
-    if file_path:
-        os.remove(file_path)
+    try:
+        final_state = await run_heavy(invoke_supervisor, user_content, memory_mb)
+    finally:
+        # Optionally remove the file after processing
+        if file_path:
+            shutil.rmtree(os.path.dirname(file_path))
 
     # Extract the final summary or relevant response
     
 
     return {"result": final_state}
 
+@app.post("/batch")
+async def run_batch(
+    content: str = Form(...),
+    files: List[UploadFile] = File(...),
+    email: Optional[str] = Form(None),
+    subject: Optional[str] = Form(None),
+):
+    file_paths, names = save_batch_uploads(files)
+    try:
+        # Batches are the least interactive traffic, they queue behind everything else
+        with priority(LOW):
+            result = await run_batch_task(
+                process_batch,
+                file_paths,
+                content,
+                names=names,
+                receiver_address=email,
+                email_subject=subject,
+            )
+    finally:
+        for file_path in file_paths:
+            os.remove(file_path)
+
+    return {"result": result}
+
+def save_batch_uploads(files: List[UploadFile]):
+    # Prefix with a random id so identical filenames in one batch don't clash
+    file_paths, names = [], []
+    for file in files:
+        if not (file and file.filename):
+            continue
+        file_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4().hex}_{file.filename}")
+        with open(file_path, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+        file_paths.append(file_path)
+        names.append(file.filename)
+    print(f"Received batch of {len(file_paths)} files")
+    return file_paths, names
+
+@app.post("/batch/jobs")
+async def submit_batch_job(
+    content: str = Form(...),
+    files: List[UploadFile] = File(...),
+    email: Optional[str] = Form(None),
+    subject: Optional[str] = Form(None),
+):
+    file_paths, names = save_batch_uploads(files)
+    job_id = job_queue.submit("batch", {
+        "file_paths": file_paths,
+        "names": names,
+        "instruction": content,
+        "email": email,
+        "subject": subject,
+    })
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/batch/jobs/{job_id}")
+async def get_batch_job(job_id: str):
+    job = job_queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/metrics")
+async def metrics():
+    # Budgets are per worker process; the job queue is shared by all of them
+    return {**resource_scheduler.stats(), "jobs": job_queue.queue_depth()}
+
+def _live_messages(session) -> list:
+    if not session or time.time() - session["updated"] > REVIEW_SESSION_TTL:
+        return []
+    return session["messages"]
+
+def load_review_history(key: str) -> list:
+    return messages_from_dict(_live_messages(sessions.get(key)))
+
+def append_review_history(key: str, *messages) -> list:
+    """Atomically append messages to the stored history and return it."""
+    new_messages = messages_to_dict(list(messages))
+    session = sessions.update(key, lambda session: {
+        "updated": time.time(),
+        # Messages are appended in user/assistant pairs, so an even limit keeps a user message first
+        "messages": (_live_messages(session) + new_messages)[-REVIEW_HISTORY_LIMIT:],
+    })
+    return messages_from_dict(session["messages"])
+
 @app.post("/review")
 async def review_endpoint(payload: ReviewRequest):
     user_input = payload.user_input.strip()
-    history = session_histories.get(user_session["id"], [])
+    history_key = f"history:{user_session['id']}"
+    history = load_review_history(history_key)
 
     # Append user input
-    history.append(HumanMessage(content=user_input))
+    user_message = HumanMessage(content=user_input)
+    history.append(user_message)
     # --- Handle numeric rating if last message was a rating request ---
     if len(history) >= 2 and isinstance(history[-2], AIMessage):
         last_ai_msg = history[-2].content.strip()
@@ -81,8 +250,7 @@ async def review_endpoint(payload: ReviewRequest):
                     store_rating(rating)
                     avg = get_average_rating()
                     response_text = f"Thanks! You rated us {rating} ⭐. Our current average rating is {avg} ⭐."
-                    history.append(AIMessage(content=response_text))
-                    session_histories[user_session["id"]] = history
+                    history = append_review_history(history_key, user_message, AIMessage(content=response_text))
                     print(response_text)
                     return {
                         "session_id": user_session["id"],
@@ -93,11 +261,10 @@ async def review_endpoint(payload: ReviewRequest):
                 pass  # Not a number, continue normally
 
     # --- Normal agent response flow ---
-    response = get_response_from_review_agent(history)
+    response = await run_in_threadpool(get_response_from_review_agent, history)
     last_message = response["messages"][-1].content.strip()
 
-    history.append(AIMessage(content=last_message))
-    session_histories[user_session["id"]] = history
+    history = append_review_history(history_key, user_message, AIMessage(content=last_message))
 
     return {
         "session_id": user_session["id"],
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# Run from Backend/ or the repo root; keep the state store out of the working tree
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("STATE_DIR", tempfile.mkdtemp(prefix="taskmaster-state-"))
+# Agent modules create their LLM clients at import time; tests never call them
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("OPENAI_API_KEY", "test")
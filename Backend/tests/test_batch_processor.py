@@ -0,0 +1,162 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("langchain_google_genai")
+
+from agents import batch_processor, email_sender
+from agents.job_queue import JobRequeued
+from agents.resource_scheduler import Budget
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeLLM:
+    def __init__(self, fail=()):
+        self.calls = []
+        self.fail = fail
+
+    def batch(self, prompts, config=None, return_exceptions=False):
+        self.calls.append(prompts)
+        return [
+            RuntimeError("quota") if any(name in prompt for name in self.fail) else FakeResponse(f"summary {i}")
+            for i, prompt in enumerate(prompts)
+        ]
+
+
+@pytest.fixture
+def extracted(monkeypatch):
+    """Run extraction on threads instead of the process pool; returns the extracted names."""
+    calls = []
+
+    def extract(kind, path, name):
+        calls.append(name)
+        if "broken" in name:
+            raise ValueError("bad file")
+        with open(path) as f:
+            return f"{kind}: {f.read()}"
+
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(batch_processor, "get_process_pool", lambda: pool)
+    monkeypatch.setattr(batch_processor, "_extract", extract)
+    monkeypatch.setattr(batch_processor, "index_in_background", lambda *args: None)
+    monkeypatch.setattr(batch_processor, "cpu_budget", Budget("cpu", 2))
+    monkeypatch.setattr(batch_processor, "memory_budget", Budget("memory", 1000, unit="MB"))
+    yield calls
+    pool.shutdown()
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    fake = FakeLLM()
+    monkeypatch.setattr(batch_processor, "llm", fake)
+    return fake
+
+
+def _files(tmp_path, contents: dict):
+    paths = []
+    for name, content in contents.items():
+        path = tmp_path / name
+        path.write_text(content)
+        paths.append(str(path))
+    return paths
+
+
+def _run(paths, **kwargs):
+    progress = []
+    result = batch_processor.process_batch(
+        paths, "Summarize", on_progress=lambda item, done, total: progress.append((item["name"], item["status"], done)),
+        **kwargs,
+    )
+    return result, progress
+
+
+def test_duplicates_are_processed_once(tmp_path, extracted, llm):
+    paths = _files(tmp_path, {"a.pdf": "same", "b.pdf": "same", "c.mp3": "audio", "d.txt": "text"})
+    result, progress = _run(paths)
+
+    assert sorted(extracted) == ["a.pdf", "c.mp3"]
+    assert len(llm.calls) == 1 and len(llm.calls[0]) == 2
+    items = {item["name"]: item for item in result["items"]}
+    assert items["a.pdf"]["status"] == items["b.pdf"]["status"] == "summarized"
+    assert items["b.pdf"]["duplicate_of"] == "a.pdf"
+    assert items["b.pdf"]["summary"] == items["a.pdf"]["summary"]
+    assert items["c.mp3"]["status"] == "summarized"
+    assert items["d.txt"]["status"] == "failed"
+    assert items["d.txt"]["error"] == "Unsupported file type"
+    assert result["total_files"] == 4
+    assert result["unique_files"] == 2
+    assert "d.txt:\nUnsupported file type" in result["summary"]
+
+    # Every file is counted as done exactly once, extraction alone doesn't count
+    assert [done for _, _, done in progress] == sorted(done for _, _, done in progress)
+    assert progress[-1][2] == 4
+    assert sum(1 for _, status, _ in progress if status in ("failed", "summarized")) == 4
+
+
+def test_failed_extraction_is_not_summarized(tmp_path, extracted, llm):
+    paths = _files(tmp_path, {"broken.pdf": "x", "ok.pdf": "y"})
+    result, progress = _run(paths)
+
+    items = {item["name"]: item for item in result["items"]}
+    assert items["broken.pdf"]["status"] == "failed"
+    assert items["broken.pdf"]["error"].startswith("Failed to extract")
+    assert items["ok.pdf"]["status"] == "summarized"
+    assert len(llm.calls[0]) == 1
+    assert progress[-1][2] == 2
+
+
+def test_too_large_items_fail_without_extraction(tmp_path, monkeypatch, extracted, llm):
+    monkeypatch.setattr(batch_processor, "estimate_memory_mb", lambda path, size: 5000 if "huge" in path else 10)
+    paths = _files(tmp_path, {"huge.mp3": "x", "copy.mp3": "x", "small.pdf": "y"})
+    result, progress = _run(paths)
+
+    items = {item["name"]: item for item in result["items"]}
+    # The duplicate shares the fate of the file it duplicates
+    assert items["huge.mp3"]["status"] == items["copy.mp3"]["status"] == "failed"
+    assert "budget is 1000 MB" in items["copy.mp3"]["error"]
+    assert items["small.pdf"]["status"] == "summarized"
+    assert extracted == ["small.pdf"]
+    assert progress[-1][2] == 3
+
+
+def test_failed_summary(tmp_path, monkeypatch, extracted):
+    fake = FakeLLM(fail=("bad.pdf",))
+    monkeypatch.setattr(batch_processor, "llm", fake)
+    paths = _files(tmp_path, {"bad.pdf": "x", "good.pdf": "y"})
+    result, _ = _run(paths)
+
+    items = {item["name"]: item for item in result["items"]}
+    assert items["bad.pdf"]["status"] == "failed"
+    assert items["bad.pdf"]["error"] == "Failed to summarize: quota"
+    assert items["good.pdf"]["status"] == "summarized"
+
+
+def test_email_is_sent_once_after_checkpoint(tmp_path, monkeypatch, extracted, llm):
+    sent = []
+    monkeypatch.setattr(email_sender, "emailer_tool", lambda *args: sent.append(args) or "sent")
+    paths = _files(tmp_path, {"a.pdf": "x"})
+    result, progress = _run(paths, receiver_address="team@example.com", email_subject="Notes")
+
+    assert result["email_status"] == "sent"
+    assert progress[-1] == ("email", "sending", 1)
+    assert len(sent) == 1
+    assert sent[0][0] == "team@example.com"
+    assert sent[0][2] == "Notes"
+
+
+def test_checkpoint_can_stop_the_email(tmp_path, monkeypatch, extracted, llm):
+    sent = []
+    monkeypatch.setattr(email_sender, "emailer_tool", lambda *args: sent.append(args))
+
+    def on_progress(item, done, total):
+        if item["name"] == "email":
+            raise JobRequeued("job")
+
+    paths = _files(tmp_path, {"a.pdf": "x"})
+    with pytest.raises(JobRequeued):
+        batch_processor.process_batch(paths, "Summarize", receiver_address="team@example.com", on_progress=on_progress)
+    assert sent == []
@@ -0,0 +1,190 @@
+import sqlite3
+import time
+
+import pytest
+
+from agents import job_queue, state_store
+
+
+@pytest.fixture(autouse=True)
+def jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(state_store, "STATE_DIR", tmp_path)
+    store = state_store.SQLiteStore("jobs")
+    monkeypatch.setattr(job_queue, "jobs", store)
+    monkeypatch.setattr(job_queue, "handlers", {})
+    monkeypatch.setattr(job_queue, "cleanups", {})
+    monkeypatch.setattr(job_queue, "POLL_INTERVAL", 0.01)
+    return store
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_claim_in_submit_order():
+    first = job_queue.submit("test", {"n": 1})
+    second = job_queue.submit("test", {"n": 2})
+    assert job_queue.queue_depth() == {"queued": 2, "running": 0}
+
+    job = job_queue.claim()
+    assert job["id"] == first
+    assert job["payload"] == {"n": 1}
+    assert job["token"]
+    assert job_queue.get_job(first)["status"] == "running"
+    assert job_queue.claim()["id"] == second
+    assert job_queue.claim() is None
+    assert job_queue.queue_depth() == {"queued": 0, "running": 2}
+
+
+def test_finish():
+    job_id = job_queue.submit("test", {})
+    job = job_queue.claim()
+    job_queue.set_progress(job_id, job["token"], {"done": 1})
+    assert job_queue.get_job(job_id)["progress"] == {"done": 1}
+
+    assert job_queue.finish(job_id, job["token"], status="done", result={"ok": True})
+    stored = job_queue.get_job(job_id)
+    assert stored["status"] == "done"
+    assert stored["result"] == {"ok": True}
+    assert job_queue.queue_depth() == {"queued": 0, "running": 0}
+
+
+def test_requeued_run_cannot_report():
+    job_id = job_queue.submit("test", {})
+    job_queue.submit("test", {})
+    old = job_queue.claim()
+    job_queue.requeue(job_id)
+    assert job_queue.get_job(job_id)["status"] == "queued"
+
+    # Back at the front of the queue
+    new = job_queue.claim()
+    assert new["id"] == job_id
+    assert new["token"] != old["token"]
+
+    with pytest.raises(job_queue.JobRequeued):
+        job_queue.set_progress(job_id, old["token"], {"done": 1})
+    assert not job_queue.heartbeat(job_id, old["token"])
+    assert not job_queue.finish(job_id, old["token"], status="done")
+    assert job_queue.finish(job_id, new["token"], status="done")
+
+
+def test_requeue_with_token_only_affects_that_run():
+    job_id = job_queue.submit("test", {})
+    job = job_queue.claim()
+    job_queue.requeue(job_id, token="someone-else")
+    assert job_queue.get_job(job_id)["status"] == "running"
+    job_queue.requeue(job_id, token=job["token"])
+    assert job_queue.get_job(job_id)["status"] == "queued"
+
+
+def test_requeue_stale(monkeypatch):
+    stale_id = job_queue.submit("test", {})
+    live_id = job_queue.submit("test", {})
+    job_queue.claim()
+    live = job_queue.claim()
+    monkeypatch.setattr(job_queue, "STALE_JOB_SECONDS", 0.05)
+
+    time.sleep(0.1)
+    assert job_queue.heartbeat(live_id, live["token"])
+    assert job_queue.requeue_stale() == [stale_id]
+    assert job_queue.get_job(stale_id)["status"] == "queued"
+    assert job_queue.get_job(live_id)["status"] == "running"
+
+
+def test_worker_runs_job_and_cleanup():
+    cleaned = []
+
+    def handler(payload, report):
+        report({"done": 1})
+        return {"double": payload["n"] * 2}
+
+    job_queue.register_handler("test", handler, cleanup=cleaned.append)
+    job_id = job_queue.submit("test", {"n": 21})
+    worker = job_queue.JobWorker()
+    worker.start()
+    try:
+        _wait_for(lambda: job_queue.get_job(job_id)["status"] == "done")
+    finally:
+        job_queue.stop_workers([worker], timeout=5)
+    job = job_queue.get_job(job_id)
+    assert job["result"] == {"double": 42}
+    assert job["progress"] == {"done": 1}
+    assert cleaned == [{"n": 21}]
+
+
+def test_worker_records_failure():
+    def handler(payload, report):
+        raise RuntimeError("boom")
+
+    job_queue.register_handler("test", handler)
+    job_id = job_queue.submit("test", {})
+    worker = job_queue.JobWorker()
+    worker.start()
+    try:
+        _wait_for(lambda: job_queue.get_job(job_id)["status"] == "failed")
+    finally:
+        job_queue.stop_workers([worker], timeout=5)
+    assert job_queue.get_job(job_id)["error"] == "boom"
+
+
+def test_requeued_run_skips_cleanup():
+    cleaned, runs = [], []
+
+    def handler(payload, report):
+        runs.append(payload)
+        if len(runs) == 1:
+            job_queue.requeue(payload["id"])
+            report({"done": 1})  # no longer owned: raises JobRequeued
+        return {}
+
+    job_queue.register_handler("test", handler, cleanup=cleaned.append)
+    job_id = job_queue.submit("test", {})
+    job_queue.jobs.update(f"job:{job_id}", lambda job: {**job, "payload": {"id": job_id}})
+    worker = job_queue.JobWorker()
+    worker.start()
+    try:
+        _wait_for(lambda: job_queue.get_job(job_id)["status"] == "done")
+    finally:
+        job_queue.stop_workers([worker], timeout=5)
+    # Only the second run, which still owned the job, cleans up
+    assert len(runs) == 2
+    assert cleaned == [{"id": job_id}]
+
+
+def test_worker_survives_store_errors(monkeypatch):
+    calls = []
+    claim = job_queue.claim
+
+    def flaky_claim():
+        calls.append(1)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return claim()
+
+    monkeypatch.setattr(job_queue, "claim", flaky_claim)
+    job_queue.register_handler("test", lambda payload, report: {})
+    job_id = job_queue.submit("test", {})
+    worker = job_queue.JobWorker()
+    worker.start()
+    try:
+        _wait_for(lambda: job_queue.get_job(job_id)["status"] == "done")
+    finally:
+        job_queue.stop_workers([worker], timeout=5)
+    assert len(calls) > 1
+
+
+def test_finished_jobs_expire(monkeypatch):
+    done_id = job_queue.submit("test", {})
+    queued_id = job_queue.submit("test", {})
+    job_queue.finish(done_id, job_queue.claim()["token"], status="done", result={})
+
+    job_queue.requeue_stale()
+    assert job_queue.get_job(done_id) is not None
+    monkeypatch.setattr(job_queue, "JOB_TTL", 0)
+    time.sleep(0.01)
+    job_queue.requeue_stale()
+    assert job_queue.get_job(done_id) is None
+    assert job_queue.get_job(queued_id)["status"] == "queued"
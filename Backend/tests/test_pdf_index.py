@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from agents import pdf_index
+from agents.pdf_index import search_pages
+
+INDEX = {
+    "hash": "abc",
+    "source": "report.pdf",
+    "pages": [
+        "1 Introduction\nThis report covers the quarterly budget.",
+        "2 Methods\nWe surveyed customers about pricing and pricing tiers.",
+        "3 Results\nRevenue grew. The budget was met.",
+        "4 Conclusion\nPricing changes are recommended.",
+    ],
+}
+
+
+def test_explicit_page_reference():
+    assert search_pages(INDEX, "What does page 3 say?") == [(3, INDEX["pages"][2])]
+
+
+def test_out_of_range_page_falls_back_to_terms():
+    assert [n for n, _ in search_pages(INDEX, "page 9 budget")] == [1, 3]
+
+
+def test_section_heading_ranks_first():
+    pages = search_pages(INDEX, "Summarize section 4", max_chars=60)
+    assert [n for n, _ in pages] == [4]
+
+
+def test_term_matches_in_document_order():
+    assert [n for n, _ in search_pages(INDEX, "pricing")] == [2, 4]
+
+
+def test_no_match():
+    assert search_pages(INDEX, "weather") == []
+
+
+def test_max_chars_limits_text():
+    pages = search_pages(INDEX, "pricing", max_chars=20)
+    assert pages == [(2, INDEX["pages"][1][:20])]
+
+
+@pytest.fixture
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_index, "INDEX_DIR", tmp_path / "index")
+    monkeypatch.setattr(pdf_index, "sources", {})
+    (tmp_path / "index").mkdir()
+    return tmp_path / "index"
+
+
+def test_find_index_by_name_or_hash(index_dir):
+    digest = "a" * 64
+    (index_dir / f"{digest}.json").write_text(json.dumps(INDEX))
+    pdf_index.sources["report.pdf"] = digest
+    assert pdf_index.find_index("report.pdf") == INDEX
+    assert pdf_index.find_index("uploads/report.pdf") == INDEX
+    assert pdf_index.find_index(digest) == INDEX
+    assert pdf_index.find_index("b" * 64) is None
+    assert pdf_index.find_index("unknown.pdf") is None
+
+
+def test_find_index_rejects_paths(index_dir, tmp_path):
+    (tmp_path / "secret.json").write_text(json.dumps({"pages": ["secret"]}))
+    assert pdf_index.find_index("../secret") is None
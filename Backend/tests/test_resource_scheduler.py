@@ -0,0 +1,145 @@
+import threading
+import time
+import uuid
+
+import pytest
+
+from agents.resource_scheduler import (
+    HIGH, LOW, NORMAL, AdmissionError, Budget, BudgetCallbackHandler, TooLargeError,
+    estimate_memory_mb, priority,
+)
+
+
+def _wait_for_waiters(budget: Budget, count: int):
+    deadline = time.monotonic() + 5
+    while budget.stats()["queue_depth"] < count:
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_acquire_and_release():
+    budget = Budget("test", 3)
+    budget.acquire(2)
+    assert budget.stats()["in_use"] == 2
+    with budget.slot():
+        assert budget.stats()["in_use"] == 3
+    budget.release(2)
+    stats = budget.stats()
+    assert stats["in_use"] == 0
+    assert stats["acquired"] == 2
+
+
+def test_too_large_is_rejected_without_waiting():
+    budget = Budget("memory", 100, unit="MB")
+    with pytest.raises(TooLargeError, match="101 MB"):
+        budget.acquire(101)
+    assert budget.stats()["rejected"] == 1
+    assert budget.stats()["in_use"] == 0
+
+
+def test_timeout():
+    budget = Budget("test", 1)
+    budget.acquire()
+    start = time.monotonic()
+    with pytest.raises(AdmissionError) as exc_info:
+        budget.acquire(timeout=0.1)
+    assert not isinstance(exc_info.value, TooLargeError)
+    assert time.monotonic() - start >= 0.1
+    stats = budget.stats()
+    assert stats["timeouts"] == 1
+    assert stats["queue_depth"] == 0
+    # A timed-out waiter does not block the ones behind it
+    budget.release()
+    budget.acquire(timeout=0.1)
+
+
+def test_waiters_served_by_priority_then_arrival():
+    budget = Budget("test", 1)
+    budget.acquire()
+    order = []
+
+    def wait(level, name):
+        budget.acquire(level=level)
+        order.append(name)
+        budget.release()
+
+    threads = []
+    for level, name in [(LOW, "low"), (NORMAL, "normal-1"), (HIGH, "high"), (NORMAL, "normal-2")]:
+        thread = threading.Thread(target=wait, args=(level, name))
+        thread.start()
+        threads.append(thread)
+        _wait_for_waiters(budget, len(threads))
+
+    budget.release()
+    for thread in threads:
+        thread.join(5)
+    assert order == ["high", "normal-1", "normal-2", "low"]
+
+
+def test_large_request_is_not_overtaken():
+    budget = Budget("test", 4)
+    budget.acquire(3)
+    order = []
+
+    def wait(amount, name):
+        budget.acquire(amount)
+        order.append(name)
+        budget.release(amount)
+
+    big = threading.Thread(target=wait, args=(4, "big"))
+    big.start()
+    _wait_for_waiters(budget, 1)
+    # One unit is free, but the small request has to queue behind the big one
+    small = threading.Thread(target=wait, args=(1, "small"))
+    small.start()
+    _wait_for_waiters(budget, 2)
+
+    budget.release(3)
+    big.join(5)
+    small.join(5)
+    assert order == ["big", "small"]
+
+
+def test_priority_context_is_used_by_default():
+    budget = Budget("test", 1)
+    budget.acquire()
+    order = []
+
+    def wait(level, name):
+        with priority(level):
+            budget.acquire()
+        order.append(name)
+        budget.release()
+
+    threads = []
+    for level, name in [(LOW, "low"), (HIGH, "high")]:
+        thread = threading.Thread(target=wait, args=(level, name))
+        thread.start()
+        threads.append(thread)
+        _wait_for_waiters(budget, len(threads))
+
+    budget.release()
+    for thread in threads:
+        thread.join(5)
+    assert order == ["high", "low"]
+
+
+def test_callback_handler_holds_a_slot_per_call():
+    budget = Budget("network", 2)
+    handler = BudgetCallbackHandler(budget)
+    first, second = uuid.uuid4(), uuid.uuid4()
+    handler.on_chat_model_start({}, [], run_id=first)
+    handler.on_chat_model_start({}, [], run_id=second)
+    assert budget.stats()["in_use"] == 2
+    handler.on_llm_end(None, run_id=first)
+    handler.on_llm_error(RuntimeError(), run_id=second)
+    # Releasing twice for the same run is a no-op
+    handler.on_llm_end(None, run_id=second)
+    assert budget.stats()["in_use"] == 0
+
+
+def test_estimate_memory_mb():
+    mb = 1024 * 1024
+    assert estimate_memory_mb("report.pdf", 10 * mb) == 90
+    assert estimate_memory_mb("call.MP3", 10 * mb) == 380
+    assert estimate_memory_mb("notes.txt", None) == 10
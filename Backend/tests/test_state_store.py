@@ -0,0 +1,79 @@
+import multiprocessing
+import threading
+
+import pytest
+
+from agents import state_store
+
+BACKENDS = {"sqlite": state_store.SQLiteStore, "file": state_store.FileStore}
+INCREMENTS = 100
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(state_store, "STATE_DIR", tmp_path)
+    return tmp_path
+
+
+def _increment(backend: str, state_dir: str, count: int):
+    # Runs in a child process
+    state_store.STATE_DIR = state_store.Path(state_dir)
+    store = BACKENDS[backend]("counter")
+    for _ in range(count):
+        store.update("n", lambda n: n + 1, default=0)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_get_set_delete(backend):
+    store = BACKENDS[backend]("test")
+    assert store.get("missing", "default") == "default"
+    store.set("key/with spaces", {"a": [1, 2]})
+    assert store.get("key/with spaces") == {"a": [1, 2]}
+    store.delete("key/with spaces")
+    assert store.get("key/with spaces") is None
+    store.delete("key/with spaces")
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_namespaces_are_separate(backend):
+    BACKENDS[backend]("one").set("key", 1)
+    assert BACKENDS[backend]("two").get("key") is None
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_update_is_atomic_across_processes(backend, state_dir):
+    ctx = multiprocessing.get_context("spawn")
+    processes = [
+        ctx.Process(target=_increment, args=(backend, str(state_dir), INCREMENTS)) for _ in range(2)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+    assert BACKENDS[backend]("counter").get("n") == 2 * INCREMENTS
+
+
+def test_unknown_backend(monkeypatch):
+    monkeypatch.setattr(state_store, "STATE_BACKEND", "redis")
+    with pytest.raises(ValueError):
+        state_store.get_store("unknown-backend-test")
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_update_waits_for_lock(backend):
+    store = BACKENDS[backend]("test")
+    store.set("n", 0)
+    done = threading.Event()
+
+    def update():
+        store.update("n", lambda n: n + 1)
+        done.set()
+
+    with store.lock():
+        thread = threading.Thread(target=update)
+        thread.start()
+        assert not done.wait(0.2)
+        store.set("n", store.get("n") + 10)
+    thread.join(5)
+    assert store.get("n") == 11
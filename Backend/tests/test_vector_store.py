@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from agents import state_store, vector_store
+
+
+@pytest.fixture(autouse=True)
+def index(tmp_path, monkeypatch):
+    monkeypatch.setattr(state_store, "STATE_DIR", tmp_path / "state")
+    meta = state_store.SQLiteStore("vector_index")
+    embeddings = DeterministicFakeEmbedding(size=32)
+    monkeypatch.setattr(vector_store, "VECTOR_INDEX_DIR", str(tmp_path / "index"))
+    monkeypatch.setattr(vector_store, "get_embeddings", lambda: embeddings)
+    monkeypatch.setattr(vector_store, "_meta", meta)
+    monkeypatch.setattr(vector_store, "_disk_lock", meta.lock)
+    monkeypatch.setattr(vector_store, "_store", None)
+    monkeypatch.setattr(vector_store, "_store_generation", None)
+    return embeddings
+
+
+def test_empty_index():
+    assert vector_store.search("anything") == []
+    assert vector_store.index_text("   ", "empty.pdf", "pdf") == 0
+
+
+def test_index_and_search():
+    assert vector_store.index_text("The budget was approved.", "minutes.pdf", "pdf") == 1
+    assert vector_store.index_text("Standup notes.", "standup.mp3", "audio") == 1
+    # The fake embedding only matches identical text
+    assert vector_store.search("Standup notes.", k=1) == [("standup.mp3", "Standup notes.")]
+    assert len(vector_store.search("anything", k=5)) == 2
+
+
+def test_same_text_is_indexed_once():
+    text = "word " * 500
+    chunks = vector_store.index_text(text, "long.pdf", "pdf")
+    assert chunks > 1
+    assert vector_store.index_text(text, "copy.pdf", "pdf") == 0
+    assert len(vector_store.search("word", k=50)) == chunks
+
+
+def test_reloads_when_another_process_saves(index):
+    vector_store.index_text("First document.", "first.pdf", "pdf")
+    generation = vector_store._store_generation
+
+    # Another worker adds a document and publishes a new generation
+    other = FAISS.load_local(vector_store.VECTOR_INDEX_DIR, index, allow_dangerous_deserialization=True)
+    other.add_texts(["Second document."], metadatas=[{"source": "second.pdf"}])
+    other.save_local(vector_store.VECTOR_INDEX_DIR)
+    vector_store._meta.set("generation", generation + 1)
+
+    assert vector_store.search("Second document.", k=1) == [("second.pdf", "Second document.")]
+    # A save from this process keeps the other worker's chunks
+    vector_store.index_text("Third document.", "third.pdf", "pdf")
+    assert vector_store._store_generation == generation + 2
+    assert {source for source, _ in vector_store.search("x", k=10)} == {"first.pdf", "second.pdf", "third.pdf"}